@@ -1,9 +1,554 @@
+import functools
+import logging
+import math
+import multiprocessing
 import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
 import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+from tqdm import tqdm
 from ultralytics import YOLO
-model = YOLO('face_yolov8n_v2.pt')
+from ultralytics.utils import ops
 
-def blur_faces_in_images(image_paths: list, output_dir: str, blur_kernel: tuple = (51, 51), confidence_threshold: float = 0.5):
+logger = logging.getLogger(__name__)
+
+# Usa a GPU (com FP16) quando disponível; caso contrário, roda na CPU em FP32.
+USE_CUDA = torch.cuda.is_available()
+DEVICE = 0 if USE_CUDA else 'cpu'
+HALF = USE_CUDA
+# Desfoque na GPU exige OpenCV compilado com suporte a CUDA.
+USE_CV_CUDA = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+
+
+def _available_cpus() -> list:
+    """Retorna os núcleos que o processo pode usar, respeitando a afinidade definida para ele (cpuset)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _split_threads(num_cores: int) -> tuple:
+    """
+    Divide os núcleos entre o PyTorch (inferência) e o OpenCV (desfoque), para que os dois
+    pools de threads não disputem os mesmos núcleos. Retorna (threads do PyTorch, threads do OpenCV).
+    """
+    torch_threads = max(1, num_cores // 2)
+    return torch_threads, max(1, num_cores - torch_threads)
+
+
+TORCH_THREADS, CV_THREADS = _split_threads(len(_available_cpus()))
+torch.set_num_threads(TORCH_THREADS)
+cv2.setNumThreads(CV_THREADS)
+
+# Tamanho do lote de inferência; também é o lote máximo do engine TensorRT exportado.
+BATCH_SIZE = 16
+IMGSZ = 640
+
+# Regiões de rosto maiores que isto (em bytes) são borradas em blocos que cabem no cache L2.
+L2_BYTES = 1 << 20
+BLUR_TILE = 256
+
+
+def _warm_up(yolo):
+    """Faz uma inferência em uma imagem vazia, para que a inicialização do backend não pese no primeiro quadro real."""
+    yolo.predict(np.zeros((IMGSZ, IMGSZ, 3), np.uint8), verbose=False, device=DEVICE, half=HALF)
+
+
+def _load_engine(weights: str):
+    """
+    Carrega e aquece a versão TensorRT (.engine) dos pesos, exportando-a na primeira execução.
+
+    Retorna None se a exportação ou o carregamento não forem possíveis (por exemplo, sem
+    TensorRT instalado, ou com um engine gerado por outra versão do TensorRT ou outra GPU),
+    ou se o engine tiver lote e tamanho fixos, para que o modelo PyTorch seja usado no lugar.
+    """
+    engine_path = os.path.splitext(weights)[0] + '.engine'
+    try:
+        if not os.path.exists(engine_path):
+            # Lote dinâmico até BATCH_SIZE, para aceitar imagens únicas e o lote final dos vídeos
+            engine_path = YOLO(weights).export(format='engine', half=True, dynamic=True, batch=BATCH_SIZE, imgsz=IMGSZ, verbose=False)
+        yolo = YOLO(engine_path, task='detect')
+        _warm_up(yolo)
+        # A entrada do modelo é montada com o lote e o tamanho letterbox de cada vídeo
+        if not yolo.predictor.model.dynamic:
+            raise ValueError("o engine não tem lote e tamanho dinâmicos")
+    except Exception as e:
+        logger.warning("Aviso: Não foi possível usar o engine TensorRT %s. Usando PyTorch. Erro: %s", engine_path, e)
+        return None
+    return yolo
+
+
+@functools.lru_cache(maxsize=1)
+def load_model(weights: str = 'face_yolov8n_v2.pt'):
+    """
+    Carrega o modelo YOLO uma única vez e o reaproveita entre as chamadas.
+
+    Com GPU disponível, usa o engine TensorRT em FP16 gerado a partir dos pesos.
+    Uma inferência de aquecimento em uma imagem vazia é feita logo após o carregamento.
+    """
+    yolo = _load_engine(weights) if USE_CUDA else None
+    if yolo is None:
+        yolo = YOLO(weights)
+        if USE_CUDA:
+            yolo.to('cuda')
+        _warm_up(yolo)
+    return yolo
+
+
+model = load_model()
+
+
+def _max_model_batch():
+    """
+    Retorna o maior lote aceito pelo backend ativo: o lote máximo do perfil de otimização
+    do engine TensorRT carregado, ou None quando não há limite (PyTorch).
+    """
+    backend = model.predictor.model
+    if not getattr(backend, 'engine', False):
+        return None
+    # No backend TensorRT do Ultralytics, backend.model é o ICudaEngine desserializado
+    engine = backend.model
+    name = next(n for n in backend.bindings if n not in backend.output_names)
+    if hasattr(engine, 'get_tensor_profile_shape'):
+        return int(engine.get_tensor_profile_shape(name, 0)[2][0])
+    # API anterior ao TensorRT 8.5
+    return int(engine.get_profile_shape(0, engine.get_binding_index(name))[2][0])
+
+
+@functools.lru_cache(maxsize=None)
+def _box_kernel(blur_kernel: tuple) -> tuple:
+    """
+    Converte o kernel gaussiano em um kernel de média com variância equivalente
+    para uma cascata de três passadas.
+    """
+    sizes = []
+    for k in blur_kernel:
+        # Mesmo sigma que o cv2.GaussianBlur usa quando sigma=0
+        sigma = 0.3 * ((k - 1) * 0.5 - 1) + 0.8
+        # Três médias de largura w têm variância 3 * (w^2 - 1) / 12
+        width = (4 * sigma * sigma + 1) ** 0.5
+        # Largura ímpar mais próxima: com largura par o OpenCV descentraliza a âncora
+        # e as três passadas deslocariam a imagem
+        sizes.append(2 * int(round((width - 1) / 2)) + 1)
+    return tuple(sizes)
+
+
+def _check_blur_options(blur_kernel: tuple, method: str):
+    """Valida uma única vez, antes do processamento, as opções de desfoque."""
+    if method not in ('blur', 'pixelate'):
+        raise ValueError(f"Método de desfoque inválido: {method!r}. Use 'blur' ou 'pixelate'.")
+    if len(blur_kernel) != 2 or any(k < 1 or k % 2 == 0 for k in blur_kernel):
+        raise ValueError(f"Kernel de desfoque inválido: {blur_kernel!r}. Deve ser uma tupla de dois ímpares positivos.")
+
+
+def _alloc_scratch(width: int, height: int) -> tuple:
+    """Aloca os dois buffers de trabalho reaproveitados pelo desfoque em todos os quadros de um vídeo."""
+    return np.empty((height, width, 3), np.uint8), np.empty((height, width, 3), np.uint8)
+
+
+def _box_blur_tiled(face_roi, ksize: tuple, out):
+    """
+    Aplica a cascata de três filtros de média bloco a bloco, gravando o resultado em out.
+
+    Cada bloco é lido com uma margem de três raios do kernel (uma por passada), de modo que
+    o centro de cada bloco fica idêntico ao obtido borrando a região inteira de uma vez.
+    """
+    h, w = face_roi.shape[:2]
+    margin_x, margin_y = 3 * (ksize[0] // 2), 3 * (ksize[1] // 2)
+    for ty in range(0, h, BLUR_TILE):
+        y0, y1 = max(0, ty - margin_y), min(h, ty + BLUR_TILE + margin_y)
+        th = min(BLUR_TILE, h - ty)
+        for tx in range(0, w, BLUR_TILE):
+            x0, x1 = max(0, tx - margin_x), min(w, tx + BLUR_TILE + margin_x)
+            tw = min(BLUR_TILE, w - tx)
+
+            blurred = cv2.boxFilter(face_roi[y0:y1, x0:x1], -1, ksize)
+            blurred = cv2.boxFilter(blurred, -1, ksize)
+            blurred = cv2.boxFilter(blurred, -1, ksize)
+            out[ty:ty + th, tx:tx + tw] = blurred[ty - y0:ty - y0 + th, tx - x0:tx - x0 + tw]
+    return out
+
+
+def _blur_roi(face_roi, blur_kernel: tuple, method: str = 'blur', scratch: tuple = None):
+    """
+    Borra a região do rosto com três passadas de cv2.boxFilter, que aproximam o
+    desfoque gaussiano com custo por pixel independente do tamanho do kernel.
+
+    Com method='pixelate', a região é reduzida para 16x16 e ampliada de volta
+    sem interpolação, gerando um efeito de mosaico que lê bem menos memória.
+
+    Se scratch (ver _alloc_scratch) for informado, os resultados intermediários e o final
+    são gravados nesses buffers em vez de alocar novos arrays a cada chamada.
+    Regiões maiores que L2_BYTES são borradas em blocos (ver _box_blur_tiled).
+    """
+    h, w = face_roi.shape[:2]
+    first = second = None
+    if scratch is not None:
+        first, second = scratch[0][:h, :w], scratch[1][:h, :w]
+
+    if method == 'pixelate':
+        small = cv2.resize(face_roi, (min(16, w), min(16, h)), interpolation=cv2.INTER_LINEAR)
+        return cv2.resize(small, (w, h), dst=first, interpolation=cv2.INTER_NEAREST)
+
+    ksize = _box_kernel(tuple(blur_kernel))
+    if face_roi.nbytes > L2_BYTES:
+        return _box_blur_tiled(face_roi, ksize, first if first is not None else np.empty_like(face_roi))
+
+    blurred = cv2.boxFilter(face_roi, -1, ksize, dst=first)
+    blurred = cv2.boxFilter(blurred, -1, ksize, dst=second)
+    return cv2.boxFilter(blurred, -1, ksize, dst=first)
+
+
+# Marca o fim do fluxo nas filas do pipeline de leitura/escrita. Exceções dessas threads
+# são guardadas em uma lista compartilhada e relançadas pela thread principal após o join();
+# até lá, as threads continuam encerrando ou esvaziando sua fila, para não bloqueá-la.
+_SENTINEL = None
+
+# Rostos são guardados como um array (N, 4) int32 de caixas (x1, y1, x2, y2).
+_NO_FACES = np.empty((0, 4), dtype=np.int32)
+
+
+def _read_video_frames(cap, read_q, errors: list):
+    """Lê os quadros do vídeo em uma thread separada e os coloca na fila de leitura."""
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            read_q.put(frame)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        read_q.put(_SENTINEL)
+
+
+def _write_video_frames(out, write_q, errors: list):
+    """Consome a fila de escrita e grava os quadros processados no vídeo de saída."""
+    while True:
+        frame = write_q.get()
+        if frame is _SENTINEL:
+            break
+        if errors:
+            continue
+        try:
+            out.write(frame)
+        except Exception as e:
+            errors.append(e)
+
+
+@functools.lru_cache(maxsize=1)
+def _has_nvenc() -> bool:
+    """Verifica se o ffmpeg disponível no PATH oferece o codificador NVENC (h264_nvenc)."""
+    if shutil.which('ffmpeg') is None:
+        return False
+    try:
+        encoders = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                  capture_output=True, text=True, check=True).stdout
+    except subprocess.CalledProcessError:
+        return False
+    return 'h264_nvenc' in encoders
+
+
+def _open_hw_decoder(video_path: str):
+    """Inicia um ffmpeg que decodifica o vídeo na GPU (NVDEC) e emite quadros BGR brutos."""
+    return subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-hwaccel', 'cuda', '-i', video_path,
+         '-map', '0:v:0', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-'],
+        stdout=subprocess.PIPE,
+    )
+
+
+def _open_hw_encoder(output_path: str, width: int, height: int, fps):
+    """Inicia um ffmpeg que recebe quadros BGR brutos e os codifica em H.264 na GPU (NVENC)."""
+    return subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+         '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+         '-c:v', 'h264_nvenc', '-pix_fmt', 'yuv420p', output_path],
+        stdin=subprocess.PIPE,
+    )
+
+
+def _read_hw_frames(decoder, width: int, height: int, read_q, status: dict, errors: list):
+    """
+    Lê os quadros decodificados pelo ffmpeg e os coloca na fila de leitura.
+
+    O código de saída do decodificador é registrado em status['decoder'].
+    """
+    try:
+        while True:
+            frame = np.empty((height, width, 3), np.uint8)
+            if decoder.stdout.readinto(memoryview(frame).cast('B')) < frame.nbytes:
+                break
+            read_q.put(frame)
+    except Exception as e:
+        errors.append(e)
+        decoder.kill()
+    finally:
+        decoder.stdout.close()
+        status['decoder'] = decoder.wait()
+        read_q.put(_SENTINEL)
+
+
+def _write_hw_frames(encoder, write_q, status: dict, errors: list):
+    """
+    Consome a fila de escrita e envia os quadros processados ao codificador ffmpeg.
+
+    Se o codificador terminar antes da hora, a fila continua sendo esvaziada até o fim,
+    para que a thread principal nunca fique bloqueada em write_q.put. O código de saída
+    do codificador é registrado em status['encoder'] (-1 se o pipe foi fechado com código 0).
+    """
+    broken_pipe = False
+    while True:
+        frame = write_q.get()
+        if frame is _SENTINEL:
+            break
+        if broken_pipe or errors:
+            continue
+        try:
+            encoder.stdin.write(frame.data)
+        except BrokenPipeError:
+            broken_pipe = True
+        except Exception as e:
+            errors.append(e)
+    try:
+        encoder.stdin.close()
+    except BrokenPipeError:
+        broken_pipe = True
+    returncode = encoder.wait()
+    status['encoder'] = returncode if returncode or not broken_pipe else -1
+
+
+def _output_jobs(input_paths: list, output_dir: str, kind: str) -> list:
+    """
+    Monta, em uma única passada, os pares (entrada, saída) dos arquivos existentes,
+    registrando de uma vez os que não foram encontrados.
+    """
+    jobs = []
+    for input_path in input_paths:
+        if os.path.isfile(input_path):
+            jobs.append((input_path, os.path.join(output_dir, f"blurred_{os.path.basename(input_path)}")))
+        else:
+            logger.warning("Aviso: O arquivo de %s não foi encontrado: %s. Pulando...", kind, input_path)
+    return jobs
+
+
+def _read_images(jobs, read_q, errors: list):
+    """Lê as imagens de entrada em uma thread separada e as coloca na fila de leitura."""
+    try:
+        for image_path, output_path in jobs:
+            frame = cv2.imread(image_path)
+            if frame is None:
+                logger.error("Erro: Não foi possível ler a imagem %s", image_path)
+                # Item sem quadro: a thread principal a desconta da barra de progresso
+                read_q.put((image_path, output_path, None))
+                continue
+
+            read_q.put((image_path, output_path, frame))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        read_q.put(_SENTINEL)
+
+
+def _write_images(write_q, verbose: bool, errors: list):
+    """Consome a fila de escrita e salva as imagens processadas em disco."""
+    while True:
+        item = write_q.get()
+        if item is _SENTINEL:
+            break
+        if errors:
+            continue
+        image_name, output_path, frame = item
+        try:
+            cv2.imwrite(output_path, frame)
+        except Exception as e:
+            errors.append(e)
+            continue
+        if verbose:
+            logger.info("Processamento concluído para %s. Salvo em: %s", image_name, output_path)
+
+
+def _extract_faces(result, confidence_threshold: float, width: int, height: int, scale: float = 1.0):
+    """
+    Extrai as caixas acima do limite de confiança como um array (N, 4) int32 já limitado
+    às bordas do quadro, com uma única cópia GPU -> CPU por resultado.
+
+    result pode ser um Results do Ultralytics ou um tensor (N, 6) [x1, y1, x2, y2, conf, cls]
+    devolvido pelo NMS; scale converte as caixas da entrada do modelo para o quadro original.
+    """
+    if isinstance(result, torch.Tensor):
+        xyxy, conf = result[:, :4], result[:, 4]
+    else:
+        xyxy, conf = result.boxes.xyxy, result.boxes.conf
+    if len(conf) == 0:
+        # Nenhuma detecção: evita a cópia para a CPU e a alocação de um novo array
+        return _NO_FACES
+    boxes = (xyxy.float().cpu().numpy() / scale).astype(np.int32)
+    confs = conf.cpu().numpy()
+    boxes = boxes[confs > confidence_threshold]
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+    return boxes
+
+
+def _alloc_model_input(max_frames: int, width: int, height: int) -> tuple:
+    """
+    Prepara, uma vez por vídeo, os buffers de entrada do modelo para até max_frames
+    quadros por envio.
+
+    Retorna (escala, (altura, largura) redimensionadas, tensores, buffers do host, stream de cópia).
+    Há dois conjuntos de buffers, usados alternadamente: enquanto um lote é inferido, o
+    seguinte já pode ser enviado ao outro. Os tensores (max_frames, 3, H, W), com H e W múltiplos de 32,
+    ficam no dispositivo de inferência, em FP16 na GPU, e já vêm preenchidos com a cor de
+    preenchimento do letterbox do Ultralytics; como a imagem é posicionada no canto superior
+    esquerdo, basta dividir as caixas pela escala para voltar ao quadro original. Na GPU, os
+    buffers do host são memória fixada (pinned) que recebe os quadros BGR uint8 do lote, e o
+    envio ocorre em um stream CUDA próprio; na CPU, recebem o quadro redimensionado.
+    """
+    scale = IMGSZ / max(width, height)
+    new_h, new_w = int(round(height * scale)), int(round(width * scale))
+    pad_h, pad_w = math.ceil(new_h / 32) * 32, math.ceil(new_w / 32) * 32
+    dtype = torch.float16 if HALF else torch.float32
+    bufs = [torch.full((max_frames, 3, pad_h, pad_w), 114 / 255, dtype=dtype, device='cuda' if USE_CUDA else 'cpu')
+            for _ in range(2)]
+    if USE_CUDA:
+        hosts = [torch.empty((max_frames, height, width, 3), dtype=torch.uint8, pin_memory=True) for _ in range(2)]
+        copy_stream = torch.cuda.Stream()
+    else:
+        hosts = [np.empty((new_h, new_w, 3), np.uint8) for _ in range(2)]
+        copy_stream = None
+    return scale, (new_h, new_w), bufs, hosts, copy_stream
+
+
+def _upload_batch(frames: list, model_input: tuple, slot: int) -> tuple:
+    """
+    Pré-processa um lote no conjunto de buffers slot de model_input (ver _alloc_model_input).
+
+    Na GPU, os quadros são copiados para a memória fixada e enviados como uint8 de forma
+    assíncrona no stream de cópia, onde também são convertidos para RGB CHW e redimensionados;
+    o evento retornado marca o fim desse trabalho. Na CPU, cada quadro é redimensionado e
+    convertido para RGB CHW normalizado em uma única passada sobre o buffer de entrada.
+    """
+    _, size, bufs, hosts, copy_stream = model_input
+    buf, host = bufs[slot], hosts[slot]
+    n = len(frames)
+    if copy_stream is None:
+        buf_np = buf.numpy()
+        for i, frame in enumerate(frames):
+            cv2.resize(frame, (size[1], size[0]), dst=host, interpolation=cv2.INTER_LINEAR)
+            # BGR HWC -> RGB CHW e normalização em uma única operação
+            np.multiply(host.transpose(2, 0, 1)[::-1], 1 / 255, out=buf_np[i, :, :size[0], :size[1]], casting='unsafe')
+        return slot, n, None
+
+    host_np = host.numpy()
+    for i, frame in enumerate(frames):
+        host_np[i] = frame
+    with torch.cuda.stream(copy_stream):
+        batch = host[:n].to('cuda', non_blocking=True)
+        # BGR HWC uint8 -> RGB CHW no intervalo [0, 1]
+        batch = batch.flip(-1).permute(0, 3, 1, 2).to(buf.dtype).div_(255)
+        buf[:n, :, :size[0], :size[1]] = F.interpolate(batch, size=size, mode='bilinear', align_corners=False)
+        uploaded = torch.cuda.Event()
+        uploaded.record(copy_stream)
+    return slot, n, uploaded
+
+
+def _infer_batch(upload: tuple, model_input: tuple, confidence_threshold: float, width: int, height: int) -> list:
+    """
+    Executa o modelo sobre um lote enviado por _upload_batch e retorna um array de rostos por quadro.
+
+    O modelo é chamado diretamente, sem o pré-processamento por quadro do Ultralytics.
+    """
+    slot, n, uploaded = upload
+    scale, _, bufs, _, _ = model_input
+    if uploaded is not None:
+        torch.cuda.current_stream().wait_event(uploaded)
+
+    with torch.inference_mode():
+        preds = model.predictor.model(bufs[slot][:n])
+    preds = preds[0] if isinstance(preds, (list, tuple)) else preds
+    detections = ops.non_max_suppression(preds, conf_thres=confidence_threshold, iou_thres=0.7)
+    return [_extract_faces(d, confidence_threshold, width, height, scale) for d in detections]
+
+
+def _blur_faces(frame, faces, blur_kernel: tuple, method: str, scratch: tuple = None):
+    """Borra, no próprio quadro, as regiões de rosto informadas como (x1, y1, x2, y2)."""
+    for (x1, y1, x2, y2) in faces:
+        face_roi = frame[y1:y2, x1:x2]
+
+        if face_roi.size > 0:
+            blurred_face_roi = _blur_roi(face_roi, blur_kernel, method, scratch)
+            frame[y1:y2, x1:x2] = blurred_face_roi
+
+
+def _init_image_worker(num_threads: int, log_level: int, worker_counter):
+    """
+    Inicializa um processo de trabalho: fixa-o em um bloco exclusivo de num_threads núcleos,
+    divide esse bloco entre as threads do PyTorch e do OpenCV e carrega o modelo uma vez.
+    """
+    global model
+    # Processos 'spawn' não herdam a configuração de logging do processo principal
+    logging.basicConfig(level=log_level, format='%(message)s')
+
+    with worker_counter.get_lock():
+        worker_index = worker_counter.value
+        worker_counter.value += 1
+    if hasattr(os, 'sched_setaffinity'):
+        cpus = _available_cpus()
+        # Processos substituídos pelo pool reaproveitam os blocos existentes
+        block = worker_index % max(1, len(cpus) // num_threads)
+        os.sched_setaffinity(0, cpus[block * num_threads:(block + 1) * num_threads])
+
+    torch_threads, cv_threads = _split_threads(num_threads)
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(cv_threads)
+    model = load_model()
+
+
+def _process_one(job: tuple) -> bool:
+    """
+    Lê, detecta, borra e salva uma única imagem dentro de um processo de trabalho.
+
+    Retorna False se a imagem não pôde ser lida.
+    """
+    image_path, output_path, blur_kernel, confidence_threshold, method, verbose = job
+    image_name = os.path.basename(image_path)
+    frame = cv2.imread(image_path)
+    if frame is None:
+        logger.error("Erro: Não foi possível ler a imagem %s", image_path)
+        return False
+
+    if verbose:
+        logger.info("Processando %s...", image_name)
+    height, width, _ = frame.shape
+
+    results = model.predict(frame, verbose=False, device=DEVICE, half=HALF)
+    faces = _extract_faces(results[0], confidence_threshold, width, height)
+    _blur_faces(frame, faces, blur_kernel, method)
+
+    cv2.imwrite(output_path, frame)
+    if verbose:
+        logger.info("Processamento concluído para %s. Salvo em: %s", image_name, output_path)
+    return True
+
+
+def _log_images_summary(total: int, skipped: int):
+    """Registra a mensagem final do processamento de imagens, informando as que foram puladas."""
+    if skipped:
+        logger.warning("Aviso: %d de %d imagens não puderam ser lidas e foram puladas.", skipped, total)
+    else:
+        logger.info("Todas as imagens foram processadas com sucesso!")
+
+
+def blur_faces_in_images(image_paths: list, output_dir: str, blur_kernel: tuple = (51, 51), confidence_threshold: float = 0.5, prefetch: int = 32, method: str = 'blur', workers: int = 1, verbose: bool = False):
     """
     Detecta rostos em uma lista de imagens e os borra, salvando as imagens processadas
     em um diretório de saída.
@@ -15,58 +560,357 @@ def blur_faces_in_images(image_paths: list, output_dir: str, blur_kernel: tuple
                              Valores maiores resultam em mais desfoque. Deve ser uma tupla de ímpares.
         confidence_threshold (float): Limite de confiança para a detecção de rostos.
                                       Apenas rostos detectados com confiança acima deste valor serão borrados.
+        prefetch (int): Tamanho máximo das filas de leitura e escrita do pipeline.
+        method (str): 'blur' para desfoque ou 'pixelate' para efeito de mosaico.
+        workers (int): Número de processos para processar as imagens em paralelo.
+                       Cada processo carrega o próprio modelo; 1 usa o pipeline com threads.
+        verbose (bool): Se True, registra uma mensagem por imagem processada em vez de
+                        exibir apenas uma barra de progresso.
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Diretório de saída criado em: {output_dir}")
+    _check_blur_options(blur_kernel, method)
 
-    try:
-        model = YOLO('face_yolov8n_v2.pt')
-    except Exception as e:
-        print(f"Erro ao carregar o modelo YOLO. Certifique-se de que 'face_yolov8n_v2.pt' está disponível. Erro: {e}")
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = _output_jobs(image_paths, output_dir, "imagem")
+
+    if workers > 1:
+        jobs = [(image_path, output_path, blur_kernel, confidence_threshold, method, verbose)
+                for image_path, output_path in jobs]
+        # 'spawn' evita herdar um contexto CUDA já inicializado pelo processo principal
+        mp_context = multiprocessing.get_context('spawn')
+        num_threads = max(1, len(_available_cpus()) // workers)
+        # OpenMP/MKL leem estas variáveis ao serem carregados, então elas precisam estar
+        # no ambiente herdado pelos processos antes de criá-los
+        saved_env = {name: os.environ.get(name) for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS')}
+        os.environ.update({name: str(_split_threads(num_threads)[0]) for name in saved_env})
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_image_worker,
+                                     initargs=(num_threads, logger.getEffectiveLevel(), mp_context.Value('i', 0))) as executor:
+                results = tqdm(executor.map(_process_one, jobs), total=len(jobs), unit='img', disable=verbose)
+                skipped = sum(not ok for ok in results)
+        finally:
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        _log_images_summary(len(jobs), skipped)
         return
-        
-    for image_path in image_paths:
-        if not os.path.exists(image_path):
-            print(f"Aviso: O arquivo de imagem não foi encontrado: {image_path}. Pulando...")
-            continue
-            
-        image_name = os.path.basename(image_path)
-        output_path = os.path.join(output_dir, f"blurred_{image_name}")
-        print(f"Processando {image_name}...")
-        
-        frame = cv2.imread(image_path)
+
+    # Leitura e escrita rodam em threads próprias; detecção e desfoque ficam na thread principal
+    read_q = queue.Queue(maxsize=prefetch)
+    write_q = queue.Queue(maxsize=prefetch)
+    errors = []
+    reader = threading.Thread(target=_read_images, args=(jobs, read_q, errors), daemon=True)
+    writer = threading.Thread(target=_write_images, args=(write_q, verbose, errors), daemon=True)
+    reader.start()
+    writer.start()
+
+    progress = tqdm(total=len(jobs), unit='img', disable=verbose)
+    skipped = 0
+    while True:
+        item = read_q.get()
+        if item is _SENTINEL:
+            break
+        image_path, output_path, frame = item
         if frame is None:
-            print(f"Erro: Não foi possível ler a imagem {image_path}")
+            skipped += 1
+            progress.total -= 1
+            progress.refresh()
             continue
-            
+
+        image_name = os.path.basename(image_path)
+        if verbose:
+            logger.info("Processando %s...", image_name)
+
         height, width, _ = frame.shape
-            
-        results = model(frame, verbose=False)
-            
-        for r in results:
-            for box in r.boxes:
-                confidence = box.conf[0]
-                
-                if confidence > confidence_threshold:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    
-                    x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2), min(height, y2)
-                    
-                    face_roi = frame[y1:y2, x1:x2]
-                    
-                    if face_roi.size > 0:
-                        blurred_face_roi = cv2.GaussianBlur(face_roi, blur_kernel, 0)
-                        
-                        frame[y1:y2, x1:x2] = blurred_face_roi
-                        
-        cv2.imwrite(output_path, frame)
-        print(f"Processamento concluído para {image_name}. Salvo em: {output_path}")
-        
-    print("\nTodas as imagens foram processadas com sucesso!")
-
-
-def blur_faces_in_videos(video_paths: list, output_dir: str, blur_kernel: tuple = (51, 51), confidence_threshold: float = 0.5, detection_interval: int = 5):
+
+        results = model.predict(frame, verbose=False, device=DEVICE, half=HALF)
+        faces = _extract_faces(results[0], confidence_threshold, width, height)
+        _blur_faces(frame, faces, blur_kernel, method)
+
+        write_q.put((image_name, output_path, frame))
+        progress.update(1)
+
+    write_q.put(_SENTINEL)
+    reader.join()
+    writer.join()
+    progress.close()
+    if errors:
+        raise errors[0]
+    _log_images_summary(len(jobs), skipped)
+
+
+def _blur_faces_gpu(frame, faces, box_filter, gpu_frame):
+    """
+    Borra as regiões de rosto na GPU, com uma única cópia do quadro em cada sentido.
+
+    Usa a mesma cascata de três filtros de média de _blur_roi. Os filtros CUDA do OpenCV
+    não aceitam 3 canais de 8 bits, por isso o quadro é convertido para BGRA na GPU.
+    """
+    gpu_frame.upload(frame)
+    gpu_bgra = cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGR2BGRA)
+    for (x1, y1, x2, y2) in faces:
+        if x2 <= x1 or y2 <= y1:
+            continue
+
+        roi = cv2.cuda_GpuMat(gpu_bgra, (x1, y1, x2 - x1, y2 - y1))
+        blurred = box_filter.apply(roi)
+        blurred = box_filter.apply(blurred)
+        box_filter.apply(blurred).copyTo(roi)
+    cv2.cuda.cvtColor(gpu_bgra, cv2.COLOR_BGRA2BGR, gpu_frame)
+    gpu_frame.download(frame)
+
+
+def _init_trackers(frame, faces) -> list:
+    """Cria um rastreador KCF para cada rosto detectado, inicializado no quadro atual."""
+    trackers = []
+    for (x1, y1, x2, y2) in faces:
+        if x2 <= x1 or y2 <= y1:
+            continue
+        tracker = cv2.TrackerKCF_create()
+        tracker.init(frame, (int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        trackers.append(tracker)
+    return trackers
+
+
+def _update_trackers(trackers: list, frame, width: int, height: int):
+    """
+    Atualiza os rastreadores no quadro atual e retorna (ok, rostos).
+
+    ok é False se algum rastreador perder o rosto, indicando que uma nova detecção é necessária.
+    """
+    faces = np.empty((len(trackers), 4), dtype=np.int32)
+    for i, tracker in enumerate(trackers):
+        ok, (x, y, w, h) = tracker.update(frame)
+        if not ok:
+            return False, _NO_FACES
+        faces[i] = (x, y, x + w, y + h)
+    np.clip(faces[:, 0::2], 0, width, out=faces[:, 0::2])
+    np.clip(faces[:, 1::2], 0, height, out=faces[:, 1::2])
+    return True, faces
+
+
+def _probe_video_stream(video_path: str) -> dict:
+    """
+    Retorna os parâmetros do primeiro stream de vídeo via ffprobe (codec_name, profile,
+    level, pix_fmt, width, height e r_frame_rate), como um dicionário de strings.
+    """
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=codec_name,profile,level,pix_fmt,width,height,r_frame_rate',
+         '-of', 'default=noprint_wrappers=1', video_path],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return dict(line.split('=', 1) for line in output.splitlines() if '=' in line)
+
+
+# Perfis H.264 que o libx264 consegue reproduzir em 8 bits 4:2:0, com o nome usado em -profile:v.
+_X264_PROFILES = {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high'}
+
+
+def _probe_keyframes(video_path: str, fps: Fraction) -> list:
+    """Retorna os números (a partir de 1) dos quadros-chave do vídeo, em ordem de exibição."""
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+         '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', video_path],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    times = sorted(float(t) for t in output if t not in ('', 'N/A'))
+    if not times:
+        return [1]
+    return sorted({int(round((t - times[0]) * fps)) + 1 for t in times})
+
+
+def _detect_faces_only(cap, detection_interval: int, batch_size: int, confidence_threshold: float, width: int, height: int):
+    """
+    Primeira passada: executa apenas a detecção, em lotes, nos quadros de detecção.
+
+    Os demais quadros são descartados com cap.grab(), que no backend FFmpeg ainda os
+    decodifica, mas dispensa a conversão de cor e a cópia para um array.
+    Como no pipeline quadro a quadro, cada lote é enviado ao modelo antes da inferência do
+    anterior, alternando entre os dois conjuntos de buffers de _alloc_model_input.
+    Retorna um dicionário {número do quadro: lista de rostos} e o total de quadros lidos.
+    """
+    detections = {}
+    frame_number = 0
+    frame_batch = []
+    frame_indices = []
+    model_input = _alloc_model_input(batch_size, width, height)
+    pending = None
+    slot = 0
+
+    while True:
+        grabbed = cap.grab()
+        if grabbed:
+            frame_number += 1
+            if frame_number % detection_interval != 0:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            frame_batch.append(frame)
+            frame_indices.append(frame_number)
+            if len(frame_batch) < batch_size:
+                continue
+
+        submitted = None
+        if frame_batch:
+            submitted = (frame_indices, _upload_batch(frame_batch, model_input, slot))
+            slot ^= 1
+            frame_batch = []
+            frame_indices = []
+
+        # No fim do vídeo, o último lote enviado é inferido logo em seguida
+        ready = [pending] if pending is not None else []
+        if not grabbed and submitted is not None:
+            ready.append(submitted)
+        pending = submitted if grabbed else None
+
+        for batch_indices, upload in ready:
+            faces = _infer_batch(upload, model_input, confidence_threshold, width, height)
+            detections.update(zip(batch_indices, faces))
+
+        if not grabbed:
+            break
+
+    return detections, frame_number
+
+
+def _blur_video_stream_copy(video_path: str, output_path: str, width: int, height: int, blur_kernel: tuple,
+                            confidence_threshold: float, detection_interval: int, batch_size: int, method: str) -> bool:
+    """
+    Processa o vídeo recodificando apenas os GOPs que contêm rostos.
+
+    Uma primeira passada detecta os rostos; os intervalos entre quadros-chave sem nenhum
+    rosto são copiados do arquivo original com 'ffmpeg -c copy', e apenas os demais são
+    decodificados, borrados e recodificados com libx264. Os segmentos são então concatenados.
+
+    Retorna False, sem deixar saída, quando o ffmpeg não está disponível, quando o vídeo não
+    é H.264 8 bits 4:2:0 com dimensões pares e perfil reproduzível pelo libx264 (a cópia direta
+    só pode ser concatenada com segmentos no mesmo codec, perfil e nível), ou quando qualquer
+    etapa do ffmpeg ou a releitura do vídeo falha; nesses casos o vídeo inteiro deve ser recodificado.
+    """
+    if shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None:
+        return False
+    try:
+        stream = _probe_video_stream(video_path)
+        fps = Fraction(stream['r_frame_rate'])
+        level = int(stream.get('level', 0))
+    except (subprocess.CalledProcessError, KeyError, ValueError, ZeroDivisionError):
+        return False
+    profile = _X264_PROFILES.get(stream.get('profile'))
+    if (stream.get('codec_name') != 'h264' or profile is None or stream.get('pix_fmt') != 'yuv420p'
+            or fps <= 0 or width % 2 or height % 2):
+        return False
+
+    encoder_args = ['-c:v', 'libx264', '-profile:v', profile, '-pix_fmt', 'yuv420p']
+    if level > 0:
+        encoder_args += ['-level:v', f"{level / 10:.1f}"]
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        _stream_copy_segments(cap, video_path, output_path, width, height, fps, stream['r_frame_rate'], encoder_args,
+                              blur_kernel, confidence_threshold, detection_interval, batch_size, method)
+    except (subprocess.CalledProcessError, OSError, EOFError) as e:
+        logger.warning("Aviso: Falha na cópia direta de %s. Erro: %s", video_path, e)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+    finally:
+        cap.release()
+    return True
+
+
+def _stream_copy_segments(cap, video_path: str, output_path: str, width: int, height: int, fps: Fraction,
+                          frame_rate: str, encoder_args: list, blur_kernel: tuple, confidence_threshold: float,
+                          detection_interval: int, batch_size: int, method: str):
+    """
+    Executa as etapas de _blur_video_stream_copy; qualquer falha do ffmpeg é propagada como
+    exceção, e um vídeo que termina antes do fim de um segmento recodificado gera EOFError.
+    """
+    detections, total_frames = _detect_faces_only(cap, detection_interval, batch_size, confidence_threshold, width, height)
+
+    # Rostos usados em cada quadro: os da última detecção, como no pipeline quadro a quadro
+    def faces_at(number):
+        return detections.get(number - number % detection_interval, _NO_FACES)
+
+    # Agrupa os GOPs consecutivos com o mesmo estado (com ou sem rostos)
+    keyframes = [k for k in _probe_keyframes(video_path, fps) if k <= total_frames]
+    bounds = keyframes + [total_frames + 1]
+    segments = []
+    for start, end in zip(bounds, bounds[1:]):
+        dirty = any(len(faces_at(n)) for n in range(start, end))
+        if segments and segments[-1][2] == dirty:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end, dirty])
+
+    # Os segmentos são percorridos em ordem, então o vídeo é relido sequencialmente do início:
+    # a busca por quadro do backend FFmpeg não é exata em muitos arquivos H.264, e um quadro
+    # errado deslocaria as caixas dos rostos
+    cap.open(video_path)
+    next_frame = 1
+    scratch = None
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path) or None) as tmp_dir:
+        segment_paths = []
+        for index, (start, end, dirty) in enumerate(segments):
+            segment_path = os.path.join(tmp_dir, f"segment_{index:05d}.ts")
+            segment_paths.append(segment_path)
+
+            if not dirty:
+                # Meio quadro à frente garante que a busca caia exatamente neste quadro-chave
+                start_time = float((start - 1 + Fraction(1, 2)) / fps)
+                subprocess.run(
+                    ['ffmpeg', '-v', 'error', '-y', '-ss', f"{start_time:.6f}", '-i', video_path,
+                     '-map', '0:v:0', '-frames:v', str(end - start), '-c', 'copy',
+                     '-bsf:v', 'h264_mp4toannexb', '-f', 'mpegts', segment_path],
+                    check=True,
+                )
+                continue
+
+            # Mesmo perfil, nível e formato de pixel do vídeo original, para que os segmentos
+            # recodificados possam ser concatenados aos copiados
+            encoder = subprocess.Popen(
+                ['ffmpeg', '-v', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+                 '-s', f"{width}x{height}", '-r', frame_rate, '-i', '-']
+                + encoder_args + ['-f', 'mpegts', segment_path],
+                stdin=subprocess.PIPE,
+            )
+            try:
+                if scratch is None:
+                    scratch = _alloc_scratch(width, height)
+                # Descarta os quadros dos segmentos copiados anteriores
+                for number in range(next_frame, start):
+                    if not cap.grab():
+                        raise EOFError(f"o vídeo terminou no quadro {number - 1}, antes do quadro {start}")
+                for number in range(start, end):
+                    ret, frame = cap.read()
+                    if not ret:
+                        raise EOFError(f"o vídeo terminou no quadro {number - 1}, antes do quadro {end - 1}")
+                    faces = faces_at(number)
+                    if len(faces):
+                        _blur_faces(frame, faces, blur_kernel, method, scratch)
+                    encoder.stdin.write(frame.data)
+                next_frame = end
+                encoder.stdin.close()
+            except (OSError, EOFError):
+                encoder.kill()
+                encoder.wait()
+                raise
+            if encoder.wait() != 0:
+                raise subprocess.CalledProcessError(encoder.returncode, 'ffmpeg')
+
+        list_path = os.path.join(tmp_dir, 'segments.txt')
+        with open(list_path, 'w') as f:
+            f.writelines(f"file '{os.path.abspath(path)}'\n" for path in segment_paths)
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+             '-c', 'copy', output_path],
+            check=True,
+        )
+
+
+def blur_faces_in_videos(video_paths: list, output_dir: str, blur_kernel: tuple = (51, 51), confidence_threshold: float = 0.5, detection_interval: int = 5, batch_size: int = BATCH_SIZE, prefetch: int = 32, method: str = 'blur', stream_copy: bool = False, use_tracker: bool = False, hw_codec: bool = False, preview: bool = False, verbose: bool = False):
     """
     Detecta rostos em uma lista de vídeos e os borra, salvando os vídeos processados
     em um diretório de saída.
@@ -80,78 +924,213 @@ def blur_faces_in_videos(video_paths: list, output_dir: str, blur_kernel: tuple
                                       Apenas rostos detectados com confiança acima deste valor serão borrados.
         detection_interval (int): Intervalo de quadros para realizar a detecção de rostos.
                                   Por exemplo, 5 significa detectar a cada 5 quadros.
+        batch_size (int): Quantidade de quadros lidos antes de executar a inferência.
+                          Os quadros de detecção do lote são enviados ao modelo em uma única chamada.
+        prefetch (int): Tamanho máximo das filas de leitura e escrita de quadros.
+        method (str): 'blur' para desfoque ou 'pixelate' para efeito de mosaico.
+        stream_copy (bool): Se True, copia sem recodificar os trechos do vídeo sem rostos
+                            (requer ffmpeg e vídeo H.264 8 bits 4:2:0; caso contrário, o vídeo inteiro é recodificado).
+        use_tracker (bool): Se True, acompanha os rostos entre as detecções com rastreadores KCF
+                            em vez de repetir as últimas caixas, e detecta novamente assim que um
+                            rastreador perde o rosto. Permite usar um detection_interval maior.
+                            Requer opencv-contrib-python e não se aplica ao modo stream_copy.
+        hw_codec (bool): Se True, decodifica e codifica o vídeo na GPU (NVDEC/NVENC) via ffmpeg,
+                         gerando H.264 em vez de mp4v. Requer GPU NVIDIA e ffmpeg com suporte a NVENC;
+                         vídeos com largura ou altura ímpar usam o OpenCV.
+        preview (bool): Se True, gera uma prévia rápida: cada quadro é reduzido uma única vez para
+                        o tamanho de entrada do modelo, detectado e borrado nessa resolução, e então
+                        ampliado de volta. Troca qualidade por muito menos memória movimentada.
+                        Não se aplica ao modo stream_copy.
+        verbose (bool): Se True, registra o andamento a cada 30 quadros em vez de exibir
+                        uma barra de progresso.
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Diretório de saída criado em: {output_dir}")
+    _check_blur_options(blur_kernel, method)
 
-    try:
-        model = YOLO('face_yolov8n_v2.pt')
-    except Exception as e:
-        print(f"Erro ao carregar o modelo YOLO. Certifique-se de que 'face_yolov8n_v2.pt' está disponível. Erro: {e}")
-        return
+    max_batch = _max_model_batch()
+    if max_batch is not None and batch_size > max_batch:
+        logger.warning("Aviso: batch_size=%d excede o lote máximo do engine TensorRT (%d). Usando %d.",
+                       batch_size, max_batch, max_batch)
+        batch_size = max_batch
 
-    for video_path in video_paths:
-        if not os.path.exists(video_path):
-            print(f"Aviso: O arquivo de vídeo não foi encontrado: {video_path}. Pulando...")
-            continue
+    if hw_codec and not (USE_CUDA and _has_nvenc()):
+        logger.warning("Aviso: GPU NVIDIA ou ffmpeg com NVENC indisponível. Usando a decodificação/codificação do OpenCV.")
+        hw_codec = False
+
+    if use_tracker and not hasattr(cv2, 'TrackerKCF_create'):
+        logger.warning("Aviso: Rastreador KCF indisponível (instale opencv-contrib-python). Reutilizando as últimas detecções.")
+        use_tracker = False
+
+    os.makedirs(output_dir, exist_ok=True)
 
+    for video_path, output_path in _output_jobs(video_paths, output_dir, "vídeo"):
         video_name = os.path.basename(video_path)
-        output_path = os.path.join(output_dir, f"blurred_{video_name}")
-        print(f"Processando {video_name}...")
+        logger.info("Processando %s...", video_name)
 
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
-            print(f"Erro: Não foi possível abrir o vídeo {video_path}")
+            logger.error("Erro: Não foi possível abrir o vídeo %s", video_path)
             continue
 
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        cap_fps = cap.get(cv2.CAP_PROP_FPS)
+        fps = int(cap_fps)
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        if stream_copy:
+            cap.release()
+            if _blur_video_stream_copy(video_path, output_path, width, height, blur_kernel,
+                                       confidence_threshold, detection_interval, batch_size, method):
+                logger.info("Processamento concluído para %s. Salvo em: %s", video_name, output_path)
+                continue
+            logger.warning("Aviso: Cópia direta indisponível (requer ffmpeg e vídeo H.264 8 bits 4:2:0). Recodificando o vídeo inteiro...")
+            cap = cv2.VideoCapture(video_path)
+
+        # Decodificação e codificação em threads próprias, sobrepostas à inferência
+        read_q = queue.Queue(maxsize=prefetch)
+        write_q = queue.Queue(maxsize=prefetch)
+        errors = []
+        # O NVENC em yuv420p exige largura e altura pares
+        use_hw_codec = hw_codec and width % 2 == 0 and height % 2 == 0
+        if use_hw_codec:
+            cap.release()
+            codec_status = {}
+            decoder = _open_hw_decoder(video_path)
+            encoder = _open_hw_encoder(output_path, width, height, cap_fps)
+            reader = threading.Thread(target=_read_hw_frames, args=(decoder, width, height, read_q, codec_status, errors), daemon=True)
+            writer = threading.Thread(target=_write_hw_frames, args=(encoder, write_q, codec_status, errors), daemon=True)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            reader = threading.Thread(target=_read_video_frames, args=(cap, read_q, errors), daemon=True)
+            writer = threading.Thread(target=_write_video_frames, args=(out, write_q, errors), daemon=True)
+        reader.start()
+        writer.start()
+
+        # Na prévia, todo o processamento ocorre na resolução de entrada do modelo,
+        # com o kernel de desfoque reduzido na mesma proporção
+        proc_w, proc_h, proc_kernel = width, height, blur_kernel
+        if preview:
+            scale = min(1.0, IMGSZ / max(width, height))
+            proc_w, proc_h = int(round(width * scale)), int(round(height * scale))
+            proc_kernel = tuple(max(1, int(k * scale)) | 1 for k in blur_kernel)
+
+        # Filtros CUDA de média aceitam kernels de até 32 pixels
+        box_kernel = _box_kernel(tuple(proc_kernel))
+        use_gpu_blur = USE_CV_CUDA and method == 'blur' and max(box_kernel) <= 32
+        if use_gpu_blur:
+            gpu_frame = cv2.cuda_GpuMat()
+            box_filter = cv2.cuda.createBoxFilter(cv2.CV_8UC4, cv2.CV_8UC4, box_kernel)
+
+        # Buffers de trabalho do desfoque e entrada do modelo, alocados uma vez por vídeo (a resolução é fixa)
+        scratch = _alloc_scratch(proc_w, proc_h)
+        # Cada envio leva apenas os quadros de detecção do lote: no máximo
+        # ceil(batch_size / detection_interval) quadros consecutivos
+        model_input = _alloc_model_input(math.ceil(batch_size / detection_interval), proc_w, proc_h)
 
+        progress = tqdm(total=frame_count, desc=video_name, unit='frame', disable=verbose)
         frame_number = 0
-        last_known_faces = []
+        last_known_faces = _NO_FACES
+        trackers = []
+        frame_batch = []
+        frame_indices = []
+        # Lote já enviado ao modelo, processado somente após o envio do lote seguinte,
+        # para que a cópia de um lote se sobreponha à inferência do anterior
+        pending = None
+        slot = 0
 
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+            frame = read_q.get()
+            ret = frame is not _SENTINEL
+            if ret:
+                frame_number += 1
+                if preview:
+                    frame = cv2.resize(frame, (proc_w, proc_h), interpolation=cv2.INTER_AREA)
+                frame_batch.append(frame)
+                frame_indices.append(frame_number)
+                if len(frame_batch) < batch_size:
+                    continue
 
-            frame_number += 1
-            if frame_number % 30 == 0:
-                print(f"  -> Processando frame {frame_number}/{frame_count} de {video_name}")
-
-            if frame_number % detection_interval == 0:
-                results = model(frame, verbose=False)
-                last_known_faces = []
-                for r in results:
-                    for box in r.boxes:
-                        if box.conf[0] > confidence_threshold:
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            last_known_faces.append((x1, y1, x2, y2))
-            
-            for (x1, y1, x2, y2) in last_known_faces:
-                x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2), min(height, y2)
-                
-                face_roi = frame[y1:y2, x1:x2]
-
-                if face_roi.size > 0:
-                    blurred_face_roi = cv2.GaussianBlur(face_roi, blur_kernel, 0)
-                    frame[y1:y2, x1:x2] = blurred_face_roi
+            submitted = None
+            if frame_batch:
+                # Envia de uma só vez todos os quadros de detecção do lote
+                detect_positions = [i for i, n in enumerate(frame_indices) if n % detection_interval == 0]
+                upload = None
+                if detect_positions:
+                    upload = _upload_batch([frame_batch[i] for i in detect_positions], model_input, slot)
+                    slot ^= 1
+                submitted = (frame_batch, frame_indices, detect_positions, upload)
+                frame_batch = []
+                frame_indices = []
 
-            out.write(frame)
+            # No fim do vídeo, o último lote enviado é processado logo em seguida
+            ready = [pending] if pending is not None else []
+            if not ret and submitted is not None:
+                ready.append(submitted)
+            pending = submitted if ret else None
 
-        cap.release()
-        out.release()
-        print(f"Processamento concluído para {video_name}. Salvo em: {output_path}")
+            for batch_frames, batch_indices, detect_positions, upload in ready:
+                batch_results = {}
+                if upload is not None:
+                    faces = _infer_batch(upload, model_input, confidence_threshold, proc_w, proc_h)
+                    batch_results = dict(zip(detect_positions, faces))
+
+                for i, (number, batch_frame) in enumerate(zip(batch_indices, batch_frames)):
+                    if verbose and number % 30 == 0:
+                        logger.info("  -> Processando frame %d/%d de %s", number, frame_count, video_name)
+                    progress.update(1)
+
+                    if i in batch_results:
+                        last_known_faces = batch_results[i]
+                        if use_tracker:
+                            trackers = _init_trackers(batch_frame, last_known_faces)
+                    elif trackers:
+                        ok, last_known_faces = _update_trackers(trackers, batch_frame, proc_w, proc_h)
+                        if not ok:
+                            # Rastreador perdeu o rosto: detecta novamente neste quadro
+                            result = model.predict(batch_frame, verbose=False, device=DEVICE, half=HALF)[0]
+                            last_known_faces = _extract_faces(result, confidence_threshold, proc_w, proc_h)
+                            trackers = _init_trackers(batch_frame, last_known_faces)
 
-    print("\nTodos os vídeos foram processados com sucesso!")
+                    # Quadros sem rostos seguem direto para a escrita, sem tocar no quadro
+                    if len(last_known_faces):
+                        if use_gpu_blur:
+                            _blur_faces_gpu(batch_frame, last_known_faces, box_filter, gpu_frame)
+                        else:
+                            _blur_faces(batch_frame, last_known_faces, proc_kernel, method, scratch)
+
+                    if preview:
+                        batch_frame = cv2.resize(batch_frame, (width, height), interpolation=cv2.INTER_LINEAR)
+                    write_q.put(batch_frame)
+
+            if not ret:
+                break
+
+        write_q.put(_SENTINEL)
+        reader.join()
+        writer.join()
+        progress.close()
+        if not use_hw_codec:
+            cap.release()
+            out.release()
+        if errors:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise errors[0]
+        if use_hw_codec:
+            if codec_status.get('decoder') or codec_status.get('encoder'):
+                logger.error("Erro: Falha no ffmpeg ao processar %s (decodificador: %s, codificador: %s). Saída descartada.",
+                             video_name, codec_status.get('decoder'), codec_status.get('encoder'))
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                continue
+        logger.info("Processamento concluído para %s. Salvo em: %s", video_name, output_path)
+
+    logger.info("Todos os vídeos foram processados com sucesso!")
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     print("--- Exemplo de Demonstração ---")
     print("Execute 'pip install opencv-python ultralytics' se ainda não o fez.")
     print("Crie um diretório de teste e adicione alguns arquivos para testar as funções.")